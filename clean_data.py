@@ -1,5 +1,5 @@
 import pandas as pd
-import numpy as np
+from pandas.api.types import is_datetime64_any_dtype
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
@@ -15,93 +15,73 @@ logging.basicConfig(
 # === File paths ===
 RAW_DATA_PATH = "data/openaq_combined_data.csv"
 LOCATIONS_PATH = "data/locations.csv"
-OUTPUT_RAW_PATH = "data/cleaned_openaq_not_interpolated.csv"
-OUTPUT_PATH = "data/cleaned_openaq.csv"
-
-# === Datetime parsing helper ===
-def parse_coverage_datetimes(df):
-    datetime_cols = [
-        "coverage.datetimeFrom.utc",
-        "coverage.datetimeFrom.local",
-        "coverage.datetimeTo.utc",
-        "coverage.datetimeTo.local"
-    ]
-
-    for col in datetime_cols:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
+OUTPUT_RAW_PATH = "data/cleaned_openaq_not_interpolated.parquet"
 
-    # Create new date-only columns
-    if "coverage.datetimeFrom.utc" in df.columns:
-        df["from_utc_date"] = df["coverage.datetimeFrom.utc"].dt.date
-    if "coverage.datetimeFrom.local" in df.columns:
-        df["from_local_date"] = pd.to_datetime(df["coverage.datetimeFrom.local"], errors="coerce").dt.date
-    if "coverage.datetimeTo.utc" in df.columns:
-        df["to_utc_date"] = df["coverage.datetimeTo.utc"].dt.date
-    if "coverage.datetimeTo.local" in df.columns:
-        df["to_local_date"] = pd.to_datetime(df["coverage.datetimeTo.local"], errors="coerce").dt.date
-
-    return df
-
-# === Interpolate data ===
-def interpolate_openaq_data(df):
-    logging.info(f"Data before cleaning: {df.describe()}")
-    aqi_columns = [
+# === Column groups ===
+AQI_COLUMNS = [
     'value', 'summary.min', 'summary.q02', 'summary.q25',
     'summary.median', 'summary.q75', 'summary.q98',
     'summary.max', 'summary.avg', 'summary.sd'
-    ]
-    logging.info("Setting datetime column as index")
-
-    df["from_local_date"] = pd.to_datetime(df["from_local_date"])
-    df.set_index("from_local_date", inplace=True)
-
-    # Replacing -ve values with NaN
-    df[aqi_columns] = df[aqi_columns].where(df[aqi_columns] >= 0, np.nan)
-
-    for col in aqi_columns:
-        neg_count = (df[col] < 0).sum()
-        logging.info(f"{col} cleaned: {neg_count} negatives replaced")
-
-    # Interpolating the values
-    df[aqi_columns] = df[aqi_columns].interpolate(method='time')
+]
+COVERAGE_DATETIME_COLUMNS = [
+    "coverage.datetimeFrom.utc",
+    "coverage.datetimeFrom.local",
+    "coverage.datetimeTo.utc",
+    "coverage.datetimeTo.local"
+]
+
+# === Columns needed from each input (everything else is dropped before merge) ===
+RAW_COLUMNS = AQI_COLUMNS + ['sensor_id', 'parameter.name', 'parameter.units'] + COVERAGE_DATETIME_COLUMNS
+RAW_DTYPES = {col: "float32" for col in AQI_COLUMNS} | {"sensor_id": "int32"}
+LOCATION_COLUMNS = ['s_id', 'provider.id', 'provider.name', 'id', 'name', 'locality']
+CATEGORY_COLUMNS = ['name', 'locality', 'parameter', 'provider.name']
+
+# === Coverage date helper ===
+def add_coverage_dates(df):
+    # Coverage columns are parsed by read_csv; any column it could not parse
+    # is left as strings, so coerce those (bad values become NaT)
+    for col in COVERAGE_DATETIME_COLUMNS:
+        if not is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format="ISO8601", utc=col.endswith(".utc"),
+                                     errors="coerce", cache=True)
+
+    # Derive date-only columns (datetime64, local dates without offset)
+    df["from_utc_date"] = df["coverage.datetimeFrom.utc"].dt.floor("D")
+    df["from_local_date"] = df["coverage.datetimeFrom.local"].dt.tz_localize(None).dt.floor("D")
+    df["to_utc_date"] = df["coverage.datetimeTo.utc"].dt.floor("D")
+    df["to_local_date"] = df["coverage.datetimeTo.local"].dt.tz_localize(None).dt.floor("D")
 
     return df
 
-
 # === Clean data ===
 def clean_openaq_data():
     logging.info("Loading data...")
-    df_raw = pd.read_csv(RAW_DATA_PATH)
-    df_locations = pd.read_csv(LOCATIONS_PATH)
+    # OpenAQ timestamps are ISO8601; local columns keep their UTC offset
+    df_raw = pd.read_csv(RAW_DATA_PATH, usecols=RAW_COLUMNS, dtype=RAW_DTYPES,
+                         parse_dates=COVERAGE_DATETIME_COLUMNS, date_format="ISO8601")
+    df_locations = pd.read_csv(LOCATIONS_PATH, usecols=LOCATION_COLUMNS)
 
     logging.info("Merging data...")
     df = pd.merge(df_raw, df_locations, left_on='sensor_id', right_on='s_id', how='left')
 
-    logging.info("Parsing coverage datetimes...")
-    df = parse_coverage_datetimes(df)
+    logging.info("Deriving coverage dates...")
+    df = add_coverage_dates(df)
 
     # Combine parameter and units
     df["parameter"] = df["parameter.name"].astype(str) + " " + df["parameter.units"].astype(str)
 
+    # Low-cardinality text columns as categoricals
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+
     # Drop unnecessary columns
     columns_to_drop = [
-        'coordinates', 'flagInfo.hasFlags', 'parameter.id', 
-        'parameter.name', 'parameter.units', 'parameter.displayName',
-        'period.label', 'period.interval',
-        'period.datetimeFrom.utc', 'period.datetimeFrom.local',
-        'period.datetimeTo.utc', 'period.datetimeTo.local',
-        'coverage.expectedCount', 'coverage.expectedInterval',
-        'coverage.observedCount', 'coverage.observedInterval',
-        'coverage.percentComplete', 'coverage.percentCoverage',
+        'parameter.name', 'parameter.units',
         'coverage.datetimeFrom.utc', 'coverage.datetimeFrom.local',
         'coverage.datetimeTo.utc', 'coverage.datetimeTo.local',
-        'datetimeFirst.utc', 'datetimeFirst.local',
-        'datetimeLast.utc', 'datetimeLast.local',
-        'distance', 's_id', 's_parameter.id','s_parameter.name',
-        's_parameter.units', 's_parameter.displayName'
+        's_id'
     ]
-    df = df.drop(columns=columns_to_drop, errors='ignore')
+    df = df.drop(columns=columns_to_drop)
 
     # Select final columns for analysis
     final_cols = [
@@ -113,12 +93,9 @@ def clean_openaq_data():
     ]
     df_analysis = df[final_cols]
 
+    # Negative values and gaps are handled per station in daily_station_timeseries
     logging.info(f"Saving cleaned data to {OUTPUT_RAW_PATH}")
-    df_analysis.to_csv(OUTPUT_RAW_PATH, index=False)
-    logging.info("Done!")
-    df_analysis_final = interpolate_openaq_data(df_analysis)
-    logging.info(f"Saving Interpolated data to {OUTPUT_PATH}")
-    df_analysis_final.to_csv(OUTPUT_PATH, index=False)
+    df_analysis.to_parquet(OUTPUT_RAW_PATH, engine="pyarrow", compression="zstd", index=False)
     logging.info("Done!")
 
 
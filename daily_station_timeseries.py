@@ -1,52 +1,153 @@
 import pandas as pd
+import numpy as np
 from pathlib import Path
+from joblib import Parallel, delayed, effective_n_jobs
+from numba import njit
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import os
+import logging
 
-input_file = "data/cleaned_openaq.csv"
+# === Setup ===
+logging.basicConfig(
+    filename="daily_station_timeseries.log",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
 
-def split_by_station(input_file, date_col="to_local_date", station_col="name", output_folder="data/stations"):
+input_file = "data/cleaned_openaq_not_interpolated.parquet"
+
+AQI_COLUMNS = [
+    'value', 'summary.min', 'summary.q02', 'summary.q25', 'summary.median',
+    'summary.q75', 'summary.q98', 'summary.max', 'summary.avg', 'summary.sd'
+]
+
+@njit(cache=True)
+def interpolate_nans(values):
+    """
+    Fills NaNs in each column of a 2D array in place, linearly between the
+    surrounding valid values (rows are assumed evenly spaced). Leading NaNs
+    are kept and trailing NaNs take the last valid value, like pandas
+    interpolate(method="linear").
+    """
+    n_rows, n_cols = values.shape
+    for c in range(n_cols):
+        last = -1
+        for r in range(n_rows):
+            if not np.isnan(values[r, c]):
+                if last >= 0 and r - last > 1:
+                    step = (values[r, c] - values[last, c]) / (r - last)
+                    for k in range(last + 1, r):
+                        values[k, c] = values[last, c] + step * (k - last)
+                last = r
+        if last >= 0:
+            for k in range(last + 1, n_rows):
+                values[k, c] = values[last, c]
+
+def process_station_chunk(daily, stations, indptr, station_col, output_folder, csv_folder=None):
     """
-    Splits a cleaned, interpolated dataset into one file per station (by 'name'),
-    applies daily frequency, and interpolates missing values.
+    Applies daily frequency, interpolates and saves every station in a
+    pre-sliced chunk of the daily (station, date) frame. Rows of stations[i]
+    are daily.iloc[indptr[i]:indptr[i + 1]]. The whole chunk is written in
+    one call to the station-partitioned Parquet dataset; if csv_folder is
+    given, a CSV copy per station is written there.
+    """
+    frames = []
+    for i, station in enumerate(stations):
+        df_station = daily.iloc[indptr[i]:indptr[i + 1]].droplevel(station_col)
+
+        # Step 1: Set daily frequency
+        df_station = df_station.asfreq("D")
+
+        # Step 2: Interpolate missing values (index is regular after asfreq,
+        # so linear matches time-weighted interpolation)
+        aqi_cols = [col for col in AQI_COLUMNS if col in df_station.columns]
+        values = np.asfortranarray(df_station[aqi_cols].to_numpy(dtype=np.float32))
+        interpolate_nans(values)
+        df_station[aqi_cols] = values
+
+        # Step 3: Collect for the dataset write (and optional CSV copy)
+        df_station = df_station.reset_index()
+        if csv_folder is not None:
+            clean_name = station.replace(" ", "_").replace("/", "_")
+            output_path = Path(csv_folder) / f"{clean_name}.csv"
+            pa_csv.write_csv(pa.Table.from_pandas(df_station, preserve_index=False), output_path)
+        df_station[station_col] = station
+        frames.append(df_station)
+
+    # Step 4: Save cleaned & interpolated stations, one partition per station
+    if frames:
+        table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+        pq.write_to_dataset(table, root_path=output_folder, partition_cols=[station_col],
+                            existing_data_behavior="delete_matching", compression="zstd",
+                            max_partitions=len(stations))
+
+    return list(stations)
+
+def split_by_station(input_file, date_col="to_local_date", station_col="name", output_folder="data/stations", n_jobs=-1, export_csv=False, csv_folder="data/stations_csv"):
+    """
+    Splits a cleaned dataset into one partition per station (by 'name'), replaces
+    negative AQI values with NaN, applies daily frequency, and interpolates
+    missing values.
+    Stations are processed in n_jobs parallel chunks and written to a Parquet
+    dataset partitioned by station_col under output_folder; set export_csv
+    to also write one CSV per station into csv_folder.
     """
 
     # === Load cleaned data ===
-    df = pd.read_csv(input_file)
+    df = pd.read_parquet(input_file)
 
     # === Ensure datetime is parsed ===
     df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
 
+    # === Station names as categorical codes ===
+    df[station_col] = df[station_col].astype("category")
+
+    # === AQI values need far less than float64 precision ===
+    aqi_cols = [col for col in AQI_COLUMNS if col in df.columns]
+    df[aqi_cols] = df[aqi_cols].astype("float32")
+
+    # === Replace negative AQI values with NaN ===
+    values = df[aqi_cols].to_numpy()
+    neg_mask = values < 0
+    np.putmask(values, neg_mask, np.nan)
+    df[aqi_cols] = values
+
+    for col, neg_count in zip(aqi_cols, neg_mask.sum(axis=0)):
+        logging.info(f"{col} cleaned: {neg_count} negatives replaced")
+
     # === Create output folder ===
     os.makedirs(output_folder, exist_ok=True)
+    if export_csv:
+        os.makedirs(csv_folder, exist_ok=True)
 
-    # === Loop through unique station names ===
-    for station in df[station_col].dropna().unique():
-        df_station = df[df[station_col] == station].copy()
+    # === Group by station and date in one pass (removes duplicate dates) ===
+    # The result is sorted by station, so each station is a contiguous block
+    daily = df.groupby([station_col, date_col], observed=True).mean(numeric_only=True)
 
-        # Set datetime index
-        df_station.set_index(date_col, inplace=True)
+    # === Row offsets of each station block ===
+    codes, stations = pd.factorize(daily.index.get_level_values(station_col))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(codes))])
 
-        # Step 1: Group by date (to remove duplicates)
-        df_station = df_station.groupby(df_station.index).mean(numeric_only=True)
+    # === Split stations into one chunk per worker ===
+    n_chunks = min(effective_n_jobs(n_jobs), len(stations))
+    chunks = [chunk for chunk in np.array_split(np.arange(len(stations)), n_chunks) if len(chunk)] if n_chunks else []
 
-        # Step 2: Set daily frequency
-        df_station = df_station.asfreq("D")
+    # === Process chunks in parallel; each worker only gets its own slice ===
+    results = Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(process_station_chunk)(
+            daily.iloc[indptr[chunk[0]]:indptr[chunk[-1] + 1]],
+            stations[chunk],
+            indptr[chunk[0]:chunk[-1] + 2] - indptr[chunk[0]],
+            station_col, output_folder, csv_folder if export_csv else None
+        )
+        for chunk in chunks
+    )
 
-        # Step 3: Interpolate missing values
-        aqi_cols = [
-            'value', 'summary.min', 'summary.q02', 'summary.q25', 'summary.median',
-            'summary.q75', 'summary.q98', 'summary.max', 'summary.avg', 'summary.sd'
-        ]
-        for col in aqi_cols:
-            if col in df_station.columns:
-                df_station[col] = df_station[col].interpolate(method="time")
-
-        # Step 4: Save cleaned & interpolated file
-        clean_name = station.replace(" ", "_").replace("/", "_")
-        output_path = Path(output_folder) / f"{clean_name}.csv"
-        df_station.to_csv(output_path)
-
-        print(f" Saved: {output_path}")
+    for saved in results:
+        for station in saved:
+            print(f" Saved: {station}")
 
     print(" All stations saved successfully!")
 
@@ -1,6 +1,9 @@
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import time
 import os
 from dotenv import load_dotenv
 import logging
@@ -27,19 +30,32 @@ if not API_KEY:
 HEADERS = {"X-API-Key": API_KEY}
 BASE_LOCATION_URL = "https://api.openaq.org/v3/locations"
 BASE_SENSOR_URL = "https://api.openaq.org/v3/sensors"
+# OpenAQ v3 rate-limits per key, so keep concurrency modest and retry
+# rate-limited (429) or server-error responses with backoff
+MAX_WORKERS = 4
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 
 ## Helper functions
 
-def fetch_paginated_data(url, params=None):
+def create_session():
+    # One keep-alive session for every request, pool sized to the worker count
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", HTTPAdapter(pool_maxsize=MAX_WORKERS))
+    return session
+
+def fetch_paginated_data(session, url, params=None):
     page = 1
     limit = 1000
     all_results = []
     while True:
-        full_url = f"{url}?page={page}&limit={limit}"
-        response = requests.get(full_url, headers=HEADERS, params=params)
+        page_params = {**(params or {}), "page": page, "limit": limit}
+        response = get_with_retry(session, url, params=page_params)
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             data = response.json()
             results = data.get("results", [])
             if not results:
@@ -47,44 +63,90 @@ def fetch_paginated_data(url, params=None):
             all_results.extend(results)
             page += 1
         else:
-            logging.error(f"Failed to fetch {url}: {response.status_code}")
+            status = response.status_code if response is not None else "no response"
+            logging.error(f"Failed to fetch {url}: {status}")
             break
     return all_results
 
-def normalize_sensor_data(sensor_ids):
-    all_sensor_data = []
+def get_with_retry(session, url, params=None):
+    """
+    GETs url through session, retrying 429/5xx responses and connection
+    errors with exponential backoff (honouring Retry-After). Returns the
+    last response, or None if every attempt failed to connect.
+    """
+    response = None
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            logging.warning(f"Request to {url} failed: {exc}")
+            response = None
+            delay = 2 ** attempt
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            logging.warning(f"Request to {url} returned {response.status_code}")
+
+        if attempt < MAX_RETRIES:
+            time.sleep(delay)
+
+    return response
+
+def fetch_sensor_data(session, s_id):
+    logging.info(f"Fetching sensor {s_id}")
+    frames = []
     params = {
         "datetime_from": "2020-01-01",
         "datetime_to": "2025-02-25",
         "limit": 1000
     }
+    url = f"{BASE_SENSOR_URL}/{s_id}/measurements/daily"
+    page = 1
+    while True:
+        params["page"] = page
+        response = get_with_retry(session, url, params=params)
 
-    for s_id in sensor_ids:
-        logging.info(f"Fetching sensor {s_id}")
-        page = 1
-        while True:
-            params["page"] = page
-            url = f"{BASE_SENSOR_URL}/{s_id}/measurements/daily"
-            response = requests.get(url, headers=HEADERS, params=params)
-
-            if response.status_code == 200:
-                data = response.json()
-                if not data.get("results"):
-                    break
-                for record in data["results"]:
-                    record["sensor_id"] = s_id
-                    all_sensor_data.append(record)
-                page += 1
-            else:
-                logging.error(f"Sensor {s_id} failed on page {page}")
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            if not data.get("results"):
                 break
+            df_page = pd.json_normalize(data["results"])
+            df_page["sensor_id"] = s_id
+            frames.append(df_page)
+            page += 1
+        else:
+            status = response.status_code if response is not None else "no response"
+            logging.error(f"Sensor {s_id} failed on page {page}: {status}")
+            return frames, False
+
+    return frames, True
+
+def normalize_sensor_data(session, sensor_ids):
+    frames = []
+    failed_ids = []
 
-    return pd.json_normalize(all_sensor_data)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(lambda s_id: fetch_sensor_data(session, s_id), sensor_ids)
+        for s_id, (sensor_frames, complete) in zip(sensor_ids, results):
+            frames.extend(sensor_frames)
+            if not complete:
+                failed_ids.append(s_id)
+
+    if failed_ids:
+        logging.warning(f"Incomplete data for {len(failed_ids)} sensors: {failed_ids}")
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
 
 
 def main():
+    session = create_session()
+
     # Step 1: Fetch all location metadata
-    all_locations = fetch_paginated_data(BASE_LOCATION_URL)
+    all_locations = fetch_paginated_data(session, BASE_LOCATION_URL)
 
     # Step 2: Filter only Indian, stationary, licensed PM2.5 sensors
     in_locations = [loc for loc in all_locations if loc.get("country", {}).get("code") == "IN"]
@@ -122,8 +184,8 @@ def main():
     df_pm25 = df_all[df_all["s_name"] == "pm25 µg/m³"]
 
     # Step 3: Convert date columns to datetime
-    df_pm25["datetimeFirst.utc"] = pd.to_datetime(df_pm25["datetimeFirst.utc"])
-    df_pm25["datetimeLast.utc"] = pd.to_datetime(df_pm25["datetimeLast.utc"])
+    df_pm25["datetimeFirst.utc"] = pd.to_datetime(df_pm25["datetimeFirst.utc"], format="ISO8601", utc=True, cache=True)
+    df_pm25["datetimeLast.utc"] = pd.to_datetime(df_pm25["datetimeLast.utc"], format="ISO8601", utc=True, cache=True)
     current_year = datetime.datetime.now().year
     df_pm25["data_duration_years"] = (df_pm25["datetimeLast.utc"] - df_pm25["datetimeFirst.utc"]).dt.days / 365
 
@@ -140,7 +202,8 @@ def main():
     sensor_ids = list(df_filtered["s_id"])
     df_filtered.to_csv("data/locations.csv")
     logging.info(f"Sensor Id's:  {sensor_ids}")
-    df_sensor_data = normalize_sensor_data(sensor_ids)
+    df_sensor_data = normalize_sensor_data(session, sensor_ids)
+    session.close()
 
     # Step 6: Save final output
     if not df_sensor_data.empty:
@@ -1,95 +1,101 @@
 import pandas as pd
+from pandas.api.types import CategoricalDtype
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import multiprocessing
 from pathlib import Path
+from urllib.parse import unquote
 
 sns.set(style="whitegrid")
 
 STATION_FOLDER = "data/stations"
 OUTPUT_FOLDER = "outputs/eda"
 
+WEEKDAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MONTH_ORDER = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
 def generate_station_eda(station_path):
-    station_name = Path(station_path).stem.replace("_", " ")
-    df = pd.read_csv(station_path, parse_dates=["to_local_date"], index_col="to_local_date")
+    # Partition folders are named "<column>=<url-encoded station name>"
+    station_name = unquote(Path(station_path).name.split("=", 1)[1])
+    df = pd.read_parquet(station_path).set_index("to_local_date").sort_index()
 
-    # Add time components
-    df["weekday"] = df.index.day_name()
-    df["month"] = df.index.month
+    # Add time components (ordered categoricals keep plot order)
+    df["weekday"] = df.index.day_name().astype(CategoricalDtype(categories=WEEKDAY_ORDER, ordered=True))
+    df["month_name"] = df.index.month_name().str[:3].astype(CategoricalDtype(categories=MONTH_ORDER, ordered=True))
     df["year"] = df.index.year
 
-    month_map = {1: "Jan", 2: "Feb", 3: "Mar", 4: "Apr", 5: "May", 6: "Jun",
-                 7: "Jul", 8: "Aug", 9: "Sep", 10: "Oct", 11: "Nov", 12: "Dec"}
-    df["month_name"] = df["month"].map(month_map)
-
     # Create output folder
-    out_path = Path(OUTPUT_FOLDER) / station_name.replace(" ", "_")
+    out_path = Path(OUTPUT_FOLDER) / station_name.replace(" ", "_").replace("/", "_")
     out_path.mkdir(parents=True, exist_ok=True)
 
+    # Daily series and its aggregates, computed once for the line plots
+    avg = pd.Series(df["summary.avg"].to_numpy(dtype="float32"), index=df.index)
+    weekly = avg.resample("W").mean()
+    monthly = avg.resample("ME").mean()
+    rolling_90 = avg.rolling(window=90).mean().to_numpy()
+
+    # One figure reused for every plot, cleared in between
+    fig, ax = plt.subplots(figsize=(10, 5))
+
     # === WEEKDAY BOXPLOT ===
-    plt.figure(figsize=(10, 5))
-    sns.boxplot(x="weekday", y="summary.avg", data=df,
-                order=["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
-    plt.title(f"AQI by Day of Week - {station_name}")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(out_path / "weekday_boxplot.png")
-    plt.close()
+    sns.boxplot(x="weekday", y="summary.avg", data=df, ax=ax)
+    ax.set_title(f"AQI by Day of Week - {station_name}")
+    plt.setp(ax.get_xticklabels(), rotation=45)
+    fig.tight_layout()
+    fig.savefig(out_path / "weekday_boxplot.png")
 
     # === MONTHLY BOXPLOT ===
-    plt.figure(figsize=(10, 5))
-    sns.boxplot(x="month_name", y="summary.avg", data=df,
-                order=["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                       "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
-    plt.title(f"Monthly AQI Seasonality - {station_name}")
-    plt.tight_layout()
-    plt.savefig(out_path / "monthly_boxplot.png")
-    plt.close()
+    ax.clear()
+    sns.boxplot(x="month_name", y="summary.avg", data=df, ax=ax)
+    ax.set_title(f"Monthly AQI Seasonality - {station_name}")
+    fig.tight_layout()
+    fig.savefig(out_path / "monthly_boxplot.png")
 
     # === YEARLY BOXPLOT ===
-    plt.figure(figsize=(10, 5))
-    sns.boxplot(x="year", y="summary.avg", data=df)
-    plt.title(f"Year-over-Year AQI - {station_name}")
-    plt.tight_layout()
-    plt.savefig(out_path / "yearly_boxplot.png")
-    plt.close()
+    ax.clear()
+    sns.boxplot(x="year", y="summary.avg", data=df, ax=ax)
+    ax.set_title(f"Year-over-Year AQI - {station_name}")
+    fig.tight_layout()
+    fig.savefig(out_path / "yearly_boxplot.png")
 
     # === WEEKLY AVG LINE PLOT ===
-    weekly = df["summary.avg"].resample("W").mean()
-    plt.figure(figsize=(12, 5))
-    plt.plot(weekly.index, weekly, marker='o')
-    plt.title(f"Weekly Average AQI - {station_name}")
-    plt.tight_layout()
-    plt.savefig(out_path / "weekly_avg_line.png")
-    plt.close()
+    ax.clear()
+    fig.set_size_inches(12, 5)
+    ax.plot(weekly.index.to_numpy(), weekly.to_numpy(), marker='o')
+    ax.set_title(f"Weekly Average AQI - {station_name}")
+    fig.tight_layout()
+    fig.savefig(out_path / "weekly_avg_line.png")
 
     # === MONTHLY AVG LINE PLOT ===
-    monthly = df["summary.avg"].resample("M").mean()
-    plt.figure(figsize=(12, 5))
-    plt.plot(monthly.index, monthly, marker='o')
-    plt.title(f"Monthly Average AQI - {station_name}")
-    plt.tight_layout()
-    plt.savefig(out_path / "monthly_avg_line.png")
-    plt.close()
+    ax.clear()
+    ax.plot(monthly.index.to_numpy(), monthly.to_numpy(), marker='o')
+    ax.set_title(f"Monthly Average AQI - {station_name}")
+    fig.tight_layout()
+    fig.savefig(out_path / "monthly_avg_line.png")
 
     # === 90-DAY ROLLING TREND ===
-    df["rolling_90"] = df["summary.avg"].rolling(window=90).mean()
-    plt.figure(figsize=(12, 5))
-    plt.plot(df.index, df["summary.avg"], alpha=0.4, label="Daily AQI")
-    plt.plot(df.index, df["rolling_90"], color="red", label="90-Day MA")
-    plt.title(f"Long-Term AQI Trend (90-Day MA) - {station_name}")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out_path / "rolling_90day_trend.png")
-    plt.close()
+    dates = df.index.to_numpy()
+    ax.clear()
+    ax.plot(dates, avg.to_numpy(), alpha=0.4, label="Daily AQI")
+    ax.plot(dates, rolling_90, color="red", label="90-Day MA")
+    ax.set_title(f"Long-Term AQI Trend (90-Day MA) - {station_name}")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(out_path / "rolling_90day_trend.png")
+    plt.close(fig)
 
     print(f"Plots saved for {station_name}")
 
-# === Loop through all station files ===
+# === Loop through all station partitions ===
 if __name__ == "__main__":
-    station_files = list(Path(STATION_FOLDER).glob("*.csv"))
+    station_files = [path for path in Path(STATION_FOLDER).glob("*=*") if path.is_dir()]
 
-    for file_path in station_files:
-        generate_station_eda(file_path)
+    # Stations are independent; Agg is already selected so workers skip GUI setup
+    with multiprocessing.Pool(processes=os.cpu_count()) as pool:
+        pool.map(generate_station_eda, station_files)
 
     print(" EDA complete for all stations!")